@@ -3,17 +3,26 @@ FastAPI Web Application for Art-Net to Home Assistant Bridge
 """
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Optional, Set
+from contextlib import asynccontextmanager
 import asyncio
 import logging
-import json
+import orjson
 from pathlib import Path
 
 from bridge_controller import get_bridge
-from config_manager import ConfigManager
+from entity_mapper import EntityType
+
+# Use uvloop when available (not supported on Windows); also covers
+# non-__main__ entry points such as gunicorn/uvicorn CLI
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    uvloop = None
 
 # Configure logging
 logging.basicConfig(
@@ -22,11 +31,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Persist pending state and release connections on shutdown."""
+    yield
+    await bridge.stop()
+    # Mapping edits made while the bridge was stopped may still be debounced
+    bridge.mapper.flush()
+    if bridge.ha_client:
+        await bridge.ha_client.close()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="OrcheStream Bridge",
     description="Art-Net to Home Assistant DMX Bridge",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -40,10 +61,12 @@ app.add_middleware(
 
 # Global instances
 bridge = get_bridge()
-config = ConfigManager()
+config = bridge.config  # Share the bridge's cached configuration
 
 # WebSocket connections for live updates
-active_connections: List[WebSocket] = []
+active_connections: Set[WebSocket] = set()
+BROADCAST_BATCH_SIZE = 50  # Max concurrent sends per broadcast batch
+_last_broadcast_payload: bytes = b''  # Last status frame pushed to clients
 
 
 # Pydantic models
@@ -56,20 +79,16 @@ class ConfigUpdate(BaseModel):
     dmx_start_channel: int
 
 
-class StatusResponse(BaseModel):
-    is_running: bool
-    artnet_running: bool
-    ha_connected: bool
-    entities_loaded: int
-    status_message: str
+# Pre-serialized bodies for constant success responses
+_BRIDGE_STARTED = orjson.dumps({"status": "success", "message": "Bridge started"})
+_BRIDGE_STOPPED = orjson.dumps({"status": "success", "message": "Bridge stopped"})
+_CONFIG_SAVED = orjson.dumps({"status": "success", "message": "Configuration saved"})
+_ENTITIES_REFRESHED = orjson.dumps({"status": "success", "message": "Entities refreshed"})
 
 
-class EntityMapping(BaseModel):
-    entity_id: str
-    name: str
-    type: str
-    channel: int
-    rgb_channels: str
+def _json_response(body: bytes) -> Response:
+    """Wrap an already serialized JSON body in a response."""
+    return Response(body, media_type="application/json")
 
 
 # API Endpoints
@@ -82,17 +101,17 @@ async def read_root():
     return HTMLResponse("<h1>OrcheStream Bridge</h1><p>Frontend not found. Please create static/index.html</p>")
 
 
-@app.get("/api/status", response_model=StatusResponse)
+@app.get("/api/status")
 async def get_status():
     """Get current bridge status."""
     status = bridge.get_status()
-    return StatusResponse(
-        is_running=bridge.running,
-        artnet_running=status.get('artnet_running', False),
-        ha_connected=status.get('ha_connected', False),
-        entities_loaded=status.get('entities_loaded', 0),
-        status_message="Running" if bridge.running else "Stopped"
-    )
+    return _json_response(orjson.dumps({
+        "is_running": bridge.running,
+        "artnet_running": status.get('artnet_running', False),
+        "ha_connected": status.get('ha_connected', False),
+        "entities_loaded": status.get('entities_loaded', 0),
+        "status_message": "Running" if bridge.running else "Stopped"
+    }))
 
 
 @app.post("/api/start")
@@ -102,16 +121,12 @@ async def start_bridge():
         if bridge.running:
             raise HTTPException(status_code=400, detail="Bridge already running")
         
-        # Set event loop
-        loop = asyncio.get_event_loop()
-        bridge.set_event_loop(loop)
-        
         await bridge.start()
         
         # Notify WebSocket clients
         await broadcast_status()
         
-        return {"status": "success", "message": "Bridge started"}
+        return _json_response(_BRIDGE_STARTED)
     except Exception as e:
         logger.error(f"Error starting bridge: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -129,7 +144,7 @@ async def stop_bridge():
         # Notify WebSocket clients
         await broadcast_status()
         
-        return {"status": "success", "message": "Bridge stopped"}
+        return _json_response(_BRIDGE_STOPPED)
     except Exception as e:
         logger.error(f"Error stopping bridge: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -138,41 +153,33 @@ async def stop_bridge():
 @app.get("/api/config")
 async def get_config():
     """Get current configuration."""
-    return config.get_all()
+    return _json_response(orjson.dumps(config.get_all()))
 
 
 @app.post("/api/config")
 async def update_config(config_data: ConfigUpdate):
     """Update configuration."""
     try:
-        config.set('HA_URL', config_data.ha_url)
-        config.set('HA_TOKEN', config_data.ha_token)
-        config.set('ARTNET_UNIVERSE', str(config_data.artnet_universe))
-        config.set('ARTNET_BIND_IP', config_data.artnet_bind_ip)
-        config.set('ARTNET_BIND_PORT', str(config_data.artnet_bind_port))
-        config.set('DMX_START_CHANNEL', str(config_data.dmx_start_channel))
+        config.write_batch({
+            'HA_URL': config_data.ha_url,
+            'HA_TOKEN': config_data.ha_token,
+            'ARTNET_UNIVERSE': str(config_data.artnet_universe),
+            'ARTNET_BIND_IP': config_data.artnet_bind_ip,
+            'ARTNET_BIND_PORT': str(config_data.artnet_bind_port),
+            'DMX_START_CHANNEL': str(config_data.dmx_start_channel)
+        })
         
-        return {"status": "success", "message": "Configuration saved"}
+        return _json_response(_CONFIG_SAVED)
     except Exception as e:
         logger.error(f"Error saving config: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/entities", response_model=List[EntityMapping])
+@app.get("/api/entities")
 async def get_entities():
     """Get entity mappings."""
     try:
-        mappings = bridge.get_mappings()
-        return [
-            EntityMapping(
-                entity_id=m.entity_id,
-                name=m.name or m.entity_id,
-                type=m.entity_type.value,
-                channel=m.dmx_channel,
-                rgb_channels=', '.join(map(str, m.rgb_channels)) if m.rgb_channels else '-'
-            )
-            for m in mappings
-        ]
+        return _json_response(bridge.get_mappings_json())
     except Exception as e:
         logger.error(f"Error getting entities: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -190,7 +197,7 @@ async def refresh_entities():
         # Notify WebSocket clients
         await broadcast_status()
         
-        return {"status": "success", "message": "Entities refreshed"}
+        return _json_response(_ENTITIES_REFRESHED)
     except Exception as e:
         logger.error(f"Error refreshing entities: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -201,21 +208,29 @@ class EntityTypeUpdate(BaseModel):
     dmx_channel: int
 
 
+# Entity types selectable from the UI
+_TYPE_MAP = {
+    'switch': EntityType.SWITCH,
+    'dimmer': EntityType.DIMMER,
+    'rgb': EntityType.RGB,
+    'rgbw': EntityType.RGBW,
+    'rgbww': EntityType.RGBWW,
+    'color_temp': EntityType.COLOR_TEMP
+}
+
+
 @app.post("/api/entities/{entity_id}/channel")
 async def update_entity_channel(entity_id: str, channel: int):
     """Update DMX channel for an entity."""
     try:
-        # Decode entity_id (URL encoded)
-        from urllib.parse import unquote
-        entity_id = unquote(entity_id)
-        
-        mapper = bridge.mapper
-        if entity_id not in mapper.mappings:
+        if entity_id not in bridge.mapper.mappings:
             raise HTTPException(status_code=404, detail="Entity not found")
         
-        mapper.update_mapping(entity_id, channel)
+        bridge.update_mapping(entity_id, channel)
         
-        return {"status": "success", "message": f"Channel updated to {channel}"}
+        return _json_response(orjson.dumps(
+            {"status": "success", "message": f"Channel updated to {channel}"}
+        ))
     except Exception as e:
         logger.error(f"Error updating channel: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -225,29 +240,15 @@ async def update_entity_channel(entity_id: str, channel: int):
 async def update_entity_type(entity_id: str, update: EntityTypeUpdate):
     """Update entity type and channel."""
     try:
-        # Decode entity_id (URL encoded)
-        from urllib.parse import unquote
-        from entity_mapper import EntityType
-        
-        entity_id = unquote(entity_id)
-        mapper = bridge.mapper
-        
-        # Convert string to EntityType
-        type_map = {
-            'switch': EntityType.SWITCH,
-            'dimmer': EntityType.DIMMER,
-            'rgb': EntityType.RGB,
-            'rgbw': EntityType.RGBW,
-            'rgbww': EntityType.RGBWW,
-            'color_temp': EntityType.COLOR_TEMP
-        }
-        
-        entity_type = type_map.get(update.entity_type.lower())
+        # Convert string to EntityType (path params arrive already URL-decoded)
+        entity_type = _TYPE_MAP.get(update.entity_type.lower())
         if not entity_type:
             raise HTTPException(status_code=400, detail=f"Invalid entity type: {update.entity_type}")
-        mapper.update_mapping(entity_id, update.dmx_channel, entity_type)
+        bridge.update_mapping(entity_id, update.dmx_channel, entity_type)
         
-        return {"status": "success", "message": f"Entity type updated to {update.entity_type}"}
+        return _json_response(orjson.dumps(
+            {"status": "success", "message": f"Entity type updated to {update.entity_type}"}
+        ))
     except Exception as e:
         logger.error(f"Error updating entity type: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -257,12 +258,12 @@ async def update_entity_type(entity_id: str, update: EntityTypeUpdate):
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for live updates."""
     await websocket.accept()
-    active_connections.append(websocket)
+    active_connections.add(websocket)
     
     try:
         # Send initial status
         status = bridge.get_status()
-        await websocket.send_json({
+        await websocket.send_bytes(orjson.dumps({
             "type": "status",
             "data": {
                 "is_running": bridge.running,
@@ -270,19 +271,20 @@ async def websocket_endpoint(websocket: WebSocket):
                 "ha_connected": status.get('ha_connected', False),
                 "entities_loaded": status.get('entities_loaded', 0)
             }
-        })
+        }))
         
         # Keep connection alive
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        pass
+    finally:
+        active_connections.discard(websocket)
 
 
 async def broadcast_status():
     """Broadcast status update to all connected WebSocket clients."""
-    if not active_connections:
-        return
+    global _last_broadcast_payload
     
     status = bridge.get_status()
     message = {
@@ -295,11 +297,34 @@ async def broadcast_status():
         }
     }
     
-    for connection in active_connections:
-        try:
-            await connection.send_json(message)
-        except:
-            pass
+    # Serialize once; skip the broadcast if clients already have this status.
+    # The payload is recorded even without clients so it never goes stale.
+    payload = orjson.dumps(message)
+    if payload == _last_broadcast_payload:
+        return
+    _last_broadcast_payload = payload
+    
+    if not active_connections:
+        return
+    
+    # Push to clients concurrently in bounded batches
+    connections = list(active_connections)
+    dead = []
+    
+    for i in range(0, len(connections), BROADCAST_BATCH_SIZE):
+        batch = connections[i:i + BROADCAST_BATCH_SIZE]
+        results = await asyncio.gather(
+            *(connection.send_bytes(payload) for connection in batch),
+            return_exceptions=True
+        )
+        
+        # Collect clients whose send failed
+        dead.extend(
+            connection for connection, result in zip(batch, results)
+            if isinstance(result, Exception)
+        )
+    
+    active_connections.difference_update(dead)
 
 
 # Mount static files
@@ -310,4 +335,11 @@ app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop" if uvloop else "asyncio",
+        http="httptools",
+        log_level="info"
+    )
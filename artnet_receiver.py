@@ -2,21 +2,44 @@
 Art-Net DMX Receiver Module
 Listens for Art-Net packets and extracts DMX channel data
 """
+import asyncio
 import socket
 import struct
-import threading
 import logging
-from typing import Callable, Dict
+from typing import Callable, Optional
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+class _ArtNetProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol feeding packets straight into the receiver on the event loop."""
+    
+    def __init__(self, receiver: 'ArtNetReceiver'):
+        self.receiver = receiver
+        
+    def datagram_received(self, data: bytes, addr):
+        try:
+            self.receiver._parse_artnet_packet(data)
+        except Exception as e:
+            logger.error(f"Error receiving Art-Net packet: {e}")
+            
+    def error_received(self, exc: Exception):
+        logger.error(f"Art-Net socket error: {exc}")
+
+
 class ArtNetReceiver:
     """Receives Art-Net DMX packets and triggers callbacks with channel data."""
     
     ARTNET_HEADER = b'Art-Net\x00'
     ARTNET_DMX = 0x5000
     
+    # ArtDmx header after the ID: opcode (raw, little-endian on the wire),
+    # protocol version, sequence, physical, universe low/high, data length
+    _HEADER = struct.Struct('>2sHBBBBH')
+    _DMX_OPCODE = struct.pack('<H', ARTNET_DMX)
+    
     def __init__(self, bind_ip: str = '0.0.0.0', port: int = 6454, universe: int = 0):
         """
         Initialize Art-Net receiver.
@@ -29,29 +52,48 @@ class ArtNetReceiver:
         self.bind_ip = bind_ip
         self.port = port
         self.universe = universe
-        self.socket = None
+        # Universe as it appears on the wire (bytes 14-15) for cheap early rejects
+        self._universe_low = universe & 0xff
+        self._universe_high = (universe >> 8) & 0xff
+        self.transport: Optional[asyncio.DatagramTransport] = None
         self.running = False
-        self.thread = None
-        self.dmx_data = [0] * 512  # DMX universe has 512 channels
+        self._dmx_bytes = bytes(512)  # DMX universe has 512 channels
+        self.dmx_data = np.frombuffer(self._dmx_bytes, dtype=np.uint8)  # Read-only view
         self.callback = None
         
-    def set_callback(self, callback: Callable[[Dict[int, int]], None]):
-        """Set callback function to be called when DMX data is received."""
+    def set_callback(self, callback: Callable[[np.ndarray], None]):
+        """
+        Set callback function to be called when DMX data changes.
+        
+        The callback receives the full universe as a uint8 array of 512
+        values (channel N is at index N-1). A new read-only array is passed
+        for every change. The callback runs on the
+        event loop thread and must not block.
+        """
         self.callback = callback
         
-    def start(self):
-        """Start listening for Art-Net packets."""
+    async def start(self):
+        """Start listening for Art-Net packets on the running event loop."""
         if self.running:
             logger.warning("Art-Net receiver already running")
             return
             
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.socket.bind((self.bind_ip, self.port))
-        self.running = True
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setblocking(False)
+        try:
+            sock.bind((self.bind_ip, self.port))
+        except OSError:
+            sock.close()
+            raise
         
-        self.thread = threading.Thread(target=self._receive_loop, daemon=True)
-        self.thread.start()
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ArtNetProtocol(self),
+            sock=sock
+        )
+        self.running = True
         
         logger.info(f"Art-Net receiver started on {self.bind_ip}:{self.port}, Universe {self.universe}")
         
@@ -61,51 +103,32 @@ class ArtNetReceiver:
             return
             
         self.running = False
-        if self.socket:
-            self.socket.close()
-        if self.thread:
-            self.thread.join(timeout=2)
+        if self.transport:
+            self.transport.close()
+            self.transport = None
         logger.info("Art-Net receiver stopped")
         
-    def _receive_loop(self):
-        """Main receive loop running in separate thread."""
-        while self.running:
-            try:
-                data, addr = self.socket.recvfrom(1024)
-                self._parse_artnet_packet(data)
-            except Exception as e:
-                if self.running:
-                    logger.error(f"Error receiving Art-Net packet: {e}")
-                    
     def _parse_artnet_packet(self, data: bytes):
         """Parse incoming Art-Net packet."""
         if len(data) < 18:
             return
             
-        # Check Art-Net header
-        if data[:8] != self.ARTNET_HEADER:
+        # Check if this is our universe before any other parsing
+        if data[14] != self._universe_low or data[15] != self._universe_high:
             return
             
-        # Check opcode (should be 0x5000 for DMX data)
-        opcode = struct.unpack('<H', data[8:10])[0]
-        if opcode != self.ARTNET_DMX:
+        # Check Art-Net header without slicing
+        if not data.startswith(self.ARTNET_HEADER):
             return
             
-        # Parse protocol version, sequence, physical, universe
-        version = struct.unpack('>H', data[10:12])[0]
-        sequence = data[12]
-        physical = data[13]
-        universe_low = data[14]
-        universe_high = data[15]
-        packet_universe = universe_low | (universe_high << 8)
+        # Unpack the remaining header fields in a single call
+        (opcode, version, sequence, physical,
+         universe_low, universe_high, length) = self._HEADER.unpack_from(data, 8)
         
-        # Check if this is our universe
-        if packet_universe != self.universe:
+        # Check opcode (should be 0x5000 for DMX data)
+        if opcode != self._DMX_OPCODE:
             return
             
-        # Get DMX data length
-        length = struct.unpack('>H', data[16:18])[0]
-        
         # Extract DMX data
         dmx_start = 18
         dmx_end = dmx_start + length
@@ -113,25 +136,26 @@ class ArtNetReceiver:
         if len(data) < dmx_end:
             return
             
-        new_dmx_data = list(data[dmx_start:dmx_end])
-        
-        # Pad with zeros if needed
-        while len(new_dmx_data) < 512:
-            new_dmx_data.append(0)
-            
-        # Check if data changed
-        if new_dmx_data != self.dmx_data:
-            self.dmx_data = new_dmx_data
+        if length >= 512:
+            # Fast path: full universe, no padding needed
+            new_dmx_bytes = data[dmx_start:dmx_start + 512]
+        else:
+            # Pad with zeros if needed
+            new_dmx_bytes = data[dmx_start:dmx_end].ljust(512, b'\x00')
             
-            # Create dictionary of channel:value pairs (1-indexed)
-            channel_data = {i+1: val for i, val in enumerate(self.dmx_data)}
+        # Check if data changed (C-level memcmp)
+        if new_dmx_bytes == self._dmx_bytes:
+            return
             
-            # Call callback if set
-            if self.callback:
-                try:
-                    self.callback(channel_data)
-                except Exception as e:
-                    logger.error(f"Error in DMX callback: {e}")
+        self._dmx_bytes = new_dmx_bytes
+        frame = self.dmx_data = np.frombuffer(new_dmx_bytes, dtype=np.uint8)
+        
+        # Call callback if set
+        if self.callback:
+            try:
+                self.callback(frame)
+            except Exception as e:
+                logger.error(f"Error in DMX callback: {e}")
                     
     def get_channel(self, channel: int) -> int:
         """
@@ -144,7 +168,7 @@ class ArtNetReceiver:
             Current value (0-255)
         """
         if 1 <= channel <= 512:
-            return self.dmx_data[channel - 1]
+            return int(self.dmx_data[channel - 1])
         return 0
         
     def get_channels(self, start: int, count: int) -> list:
@@ -161,4 +185,4 @@ class ArtNetReceiver:
         if start < 1 or start > 512:
             return []
         end = min(start + count, 512)
-        return self.dmx_data[start-1:end]
+        return self.dmx_data[start-1:end].tolist()
@@ -4,15 +4,52 @@ Coordinates Art-Net reception and Home Assistant control
 """
 import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+import orjson
 from artnet_receiver import ArtNetReceiver
 from ha_client import HomeAssistantClient
 from entity_mapper import EntityMapper
 from config_manager import ConfigManager
-import time
 
 logger = logging.getLogger(__name__)
 
+# Command keys forwarded to Home Assistant as service data
+SERVICE_DATA_KEYS = ('brightness', 'rgb_color', 'rgbw_color', 'rgbww_color', 'kelvin')
+
+
+def group_commands(commands: List[Dict[str, Any]]) -> List[Tuple[str, str, List[str], Dict[str, Any]]]:
+    """
+    Group entity commands that can share a single service call.
+    
+    Commands with the same domain, action and service data (e.g. every
+    switch being turned off at once) collapse into one group.
+    
+    Args:
+        commands: Command dictionaries from EntityMapper.get_entity_commands
+        
+    Returns:
+        List of (domain, action, entity_ids, service_data) tuples
+    """
+    groups: Dict[tuple, Tuple[str, str, List[str], Dict[str, Any]]] = {}
+    for command in commands:
+        entity_id = command['entity_id']
+        action = command['action']
+        # Commands from EntityMapper carry the mapping's cached domain
+        domain = command.get('domain') or entity_id.partition('.')[0]
+        kwargs = {key: command[key] for key in SERVICE_DATA_KEYS if key in command}
+        
+        key = (domain, action, tuple(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in kwargs.items()
+        ))
+        group = groups.get(key)
+        if group is None:
+            groups[key] = (domain, action, [entity_id], kwargs)
+        else:
+            group[2].append(entity_id)
+    return list(groups.values())
+
 
 class BridgeController:
     """Main controller that bridges Art-Net to Home Assistant."""
@@ -24,10 +61,12 @@ class BridgeController:
         self.ha_client = None
         self.mapper = EntityMapper()
         self.running = False
-        self.loop = None
-        self.last_dmx_data = {}
-        self.last_command_time = {}  # Track last command time per entity
-        self.min_command_interval = 0.05  # Minimum 50ms between commands per entity
+        self._latest_dmx: Optional[np.ndarray] = None  # Latest-wins slot for the worker
+        self._dmx_event: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._entities_json_cache: Optional[bytes] = None  # Serialized /api/entities payload
+        self.last_dmx_data = np.zeros(512, dtype=np.uint8)  # Full universe state
+        self.min_command_interval = 0.05  # Minimum 50ms between processing passes
         self.status = {
             'artnet_running': False,
             'ha_connected': False,
@@ -47,8 +86,17 @@ class BridgeController:
         ha_config = self.config.get_ha_config()
         artnet_config = self.config.get_artnet_config()
         
-        # Initialize Home Assistant client
-        self.ha_client = HomeAssistantClient(ha_config['url'], ha_config['token'])
+        # Keep the Home Assistant client (and its HTTP session) for the
+        # lifetime of the bridge; only recreate it when the target changes
+        if (self.ha_client is None
+                or self.ha_client.url != ha_config['url'].rstrip('/')
+                or self.ha_client.token != ha_config['token']):
+            if self.ha_client:
+                await self.ha_client.close()
+            self.ha_client = HomeAssistantClient(
+                ha_config['url'],
+                ha_config['token']
+            )
         
         try:
             await self.ha_client.connect()
@@ -63,12 +111,14 @@ class BridgeController:
                 # Auto-assign channels if not already mapped
                 start_channel = self.config.get_dmx_start_channel()
                 self.mapper.auto_assign_channels(entities, start_channel)
+                self._entities_json_cache = None
                 logger.info(f"Loaded {len(entities)} entities with 'orchestream' label")
             else:
                 logger.warning("No entities found with 'orchestream' label")
                 
         except Exception as e:
             logger.error(f"Failed to connect to Home Assistant: {e}")
+            await self._disconnect_ha()
             raise
             
         # Initialize Art-Net receiver
@@ -77,11 +127,24 @@ class BridgeController:
             port=artnet_config['port'],
             universe=artnet_config['universe']
         )
+        self.last_dmx_data = np.zeros(512, dtype=np.uint8)
+        self.mapper.reset_frame_state()
         self.artnet.set_callback(self._handle_dmx_data)
-        self.artnet.start()
+        try:
+            await self.artnet.start()
+        except Exception as e:
+            logger.error(f"Failed to start Art-Net receiver: {e}")
+            await self._disconnect_ha()
+            raise
         self.status['artnet_running'] = True
         
         self.running = True
+        
+        # Single consumer that coalesces DMX bursts
+        self._latest_dmx = None
+        self._dmx_event = asyncio.Event()
+        self._worker = asyncio.create_task(self._process_loop())
+        
         logger.info("Bridge started successfully")
         
     async def stop(self):
@@ -97,43 +160,65 @@ class BridgeController:
             self.artnet.stop()
             self.status['artnet_running'] = False
             
-        if self.ha_client:
-            await self.ha_client.disconnect()
-            self.status['ha_connected'] = False
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            
+        await self._disconnect_ha()
+            
+        # Write any mapping changes still waiting for the debounced save
+        self.mapper.flush()
             
         logger.info("Bridge stopped")
         
-    def _handle_dmx_data(self, dmx_data: Dict[int, int]):
+    async def _disconnect_ha(self):
+        """Disconnect from Home Assistant, keeping the client for reuse."""
+        if self.ha_client:
+            await self.ha_client.disconnect()
+        self.status['ha_connected'] = False
+        
+    def _handle_dmx_data(self, dmx_data: np.ndarray):
         """
         Handle incoming DMX data from Art-Net.
-        Called from Art-Net receiver thread.
+        Called on the event loop by the Art-Net datagram protocol.
         
         Args:
-            dmx_data: Dictionary of {channel: value}
+            dmx_data: Full universe as a uint8 array (channel N at index N-1)
         """
-        # Check if data actually changed
-        if dmx_data == self.last_dmx_data:
-            return
+        self.last_dmx_data = dmx_data
+        
+        # Hand the latest frame to the worker; intermediate frames are dropped
+        if self.running and self._dmx_event:
+            self._latest_dmx = dmx_data
+            self._dmx_event.set()
             
-        self.last_dmx_data = dmx_data.copy()
+    async def _process_loop(self):
+        """
+        Drain the latest DMX state at most once per min_command_interval.
         
-        # Process in async context
-        if self.loop and self.running:
-            try:
-                if not self.loop.is_closed():
-                    asyncio.run_coroutine_threadsafe(
-                        self._process_dmx_data(dmx_data),
-                        self.loop
-                    )
-            except Exception as e:
-                logger.error(f"Error scheduling DMX processing: {e}")
-            
-    async def _process_dmx_data(self, dmx_data: Dict[int, int]):
+        Bursts of packets (e.g. a fader sweep) collapse into a single
+        processing pass per interval instead of one pass per packet.
+        """
+        while self.running:
+            await self._dmx_event.wait()
+            
+            data = self._latest_dmx
+            self._latest_dmx = None
+            self._dmx_event.clear()
+            
+            await self._process_dmx_data(data)
+            await asyncio.sleep(self.min_command_interval)
+            
+    async def _process_dmx_data(self, dmx_data: np.ndarray):
         """
         Process DMX data and send commands to Home Assistant.
         
         Args:
-            dmx_data: Dictionary of {channel: value}
+            dmx_data: Full universe as a uint8 array (channel N at index N-1)
         """
         if not self.ha_client or not self.ha_client.connected:
             return
@@ -142,47 +227,18 @@ class BridgeController:
             # Get commands from mapper
             commands = self.mapper.get_entity_commands(dmx_data)
             
-            # Execute commands with throttling - process one at a time
-            current_time = time.time()
-            
-            for command in commands:
-                entity_id = command['entity_id']
-                action = command['action']
-                
-                # Check if we should throttle this command
-                last_time = self.last_command_time.get(entity_id, 0)
-                if current_time - last_time < self.min_command_interval:
-                    continue  # Skip this command, too soon
-                
-                try:
-                    if action == 'turn_on':
-                        kwargs = {}
-                        if 'brightness' in command:
-                            kwargs['brightness'] = command['brightness']
-                        if 'rgb_color' in command:
-                            kwargs['rgb_color'] = command['rgb_color']
-                        if 'rgbw_color' in command:
-                            kwargs['rgbw_color'] = command['rgbw_color']
-                        if 'rgbww_color' in command:
-                            kwargs['rgbww_color'] = command['rgbww_color']
-                        if 'kelvin' in command:
-                            kwargs['kelvin'] = command['kelvin']
-                            
-                        await self.ha_client.turn_on(entity_id, **kwargs)
-                        
-                    elif action == 'turn_off':
-                        await self.ha_client.turn_off(entity_id)
-                    
-                    # Update last command time
-                    self.last_command_time[entity_id] = current_time
-                    
-                    # Small delay between commands to avoid overwhelming HA
-                    await asyncio.sleep(0.01)
-                        
-                except Exception as e:
-                    logger.error(f"Error controlling {entity_id}: {e}")
+            # One service call per group of identical commands, all concurrent
+            groups = group_commands(commands)
+            results = await asyncio.gather(
+                *(self.ha_client.call_service_bulk(domain, action, entity_ids, **kwargs)
+                  for domain, action, entity_ids, kwargs in groups),
+                return_exceptions=True
+            )
+            for (_, _, entity_ids, _), result in zip(groups, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error controlling {', '.join(entity_ids)}: {result}")
                     
-            self.status['last_update'] = asyncio.get_event_loop().time()
+            self.status['last_update'] = asyncio.get_running_loop().time()
             
         except Exception as e:
             logger.error(f"Error processing DMX data: {e}")
@@ -195,6 +251,40 @@ class BridgeController:
         """Get current entity mappings."""
         return self.mapper.get_all_mappings()
         
+    def get_mappings_json(self) -> bytes:
+        """
+        Get entity mappings serialized for the API.
+        
+        The payload is cached and only rebuilt after a mapping changes.
+        
+        Returns:
+            JSON-encoded list of mappings
+        """
+        if self._entities_json_cache is None:
+            self._entities_json_cache = orjson.dumps([
+                {
+                    "entity_id": m.entity_id,
+                    "name": m.name or m.entity_id,
+                    "type": m.entity_type.value,
+                    "channel": m.dmx_channel,
+                    "rgb_channels": ', '.join(map(str, m.rgb_channels)) if m.rgb_channels else '-'
+                }
+                for m in self.mapper.get_all_mappings()
+            ])
+        return self._entities_json_cache
+        
+    def update_mapping(self, entity_id: str, dmx_channel: int, entity_type=None):
+        """
+        Update an entity mapping and invalidate the cached API payload.
+        
+        Args:
+            entity_id: Entity ID
+            dmx_channel: DMX channel to assign
+            entity_type: Optional entity type override
+        """
+        self.mapper.update_mapping(entity_id, dmx_channel, entity_type)
+        self._entities_json_cache = None
+        
     async def refresh_entities(self):
         """Refresh entities from Home Assistant."""
         if not self.ha_client or not self.ha_client.connected:
@@ -205,12 +295,9 @@ class BridgeController:
         
         start_channel = self.config.get_dmx_start_channel()
         self.mapper.auto_assign_channels(entities, start_channel)
+        self._entities_json_cache = None
         
         return entities
-        
-    def set_event_loop(self, loop):
-        """Set the asyncio event loop for callbacks."""
-        self.loop = loop
 
 
 # Global bridge instance
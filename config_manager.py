@@ -3,6 +3,8 @@ Configuration Manager Module
 Handles .env file reading and writing
 """
 import os
+import re
+import stat
 from typing import Dict
 from dotenv import load_dotenv, set_key, find_dotenv
 
@@ -19,6 +21,17 @@ class ConfigManager:
         'DMX_START_CHANNEL': '1',
     }
     
+    # Layout of the generated .env file: (section comment, keys)
+    SECTIONS = [
+        ("# Home Assistant Configuration", ['HA_URL', 'HA_TOKEN']),
+        ("# Art-Net Configuration", ['ARTNET_UNIVERSE', 'ARTNET_BIND_IP', 'ARTNET_BIND_PORT']),
+        ("# DMX Configuration", ['DMX_START_CHANNEL']),
+    ]
+    
+    _SAFE_VALUE = re.compile(r'[\w.:/@+,-]*')
+    # Assignment line in an existing .env file; group 1 is the key
+    _KEY_LINE = re.compile(r'\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_]*)\s*=')
+    
     def __init__(self, env_file: str = '.env'):
         """
         Initialize configuration manager.
@@ -29,20 +42,47 @@ class ConfigManager:
         self.env_file = env_file
         self._ensure_env_file()
         load_dotenv(self.env_file)
+        # In-memory view of the configuration; set() writes through
+        self._cache: Dict[str, str] = {
+            key: os.getenv(key, default)
+            for key, default in self.DEFAULT_CONFIG.items()
+        }
         
     def _ensure_env_file(self):
         """Ensure .env file exists with default values."""
         if not os.path.exists(self.env_file):
             with open(self.env_file, 'w') as f:
-                f.write("# Home Assistant Configuration\n")
-                f.write(f"HA_URL={self.DEFAULT_CONFIG['HA_URL']}\n")
-                f.write(f"HA_TOKEN={self.DEFAULT_CONFIG['HA_TOKEN']}\n\n")
-                f.write("# Art-Net Configuration\n")
-                f.write(f"ARTNET_UNIVERSE={self.DEFAULT_CONFIG['ARTNET_UNIVERSE']}\n")
-                f.write(f"ARTNET_BIND_IP={self.DEFAULT_CONFIG['ARTNET_BIND_IP']}\n")
-                f.write(f"ARTNET_BIND_PORT={self.DEFAULT_CONFIG['ARTNET_BIND_PORT']}\n\n")
-                f.write("# DMX Configuration\n")
-                f.write(f"DMX_START_CHANNEL={self.DEFAULT_CONFIG['DMX_START_CHANNEL']}\n")
+                f.write(self._render_env(self.DEFAULT_CONFIG))
+                
+    @classmethod
+    def _format_value(cls, value: str) -> str:
+        """Quote a value for the .env file when it contains special characters."""
+        if cls._SAFE_VALUE.fullmatch(value):
+            return value
+        return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+        
+    def _render_env(self, values: Dict[str, str]) -> str:
+        """
+        Render a complete .env file.
+        
+        Args:
+            values: Configuration values; keys outside DEFAULT_CONFIG are
+                appended after the known sections
+            
+        Returns:
+            File contents
+        """
+        blocks = []
+        for comment, keys in self.SECTIONS:
+            lines = [comment]
+            lines += [f"{key}={self._format_value(values.get(key, self.DEFAULT_CONFIG[key]))}" for key in keys]
+            blocks.append('\n'.join(lines))
+            
+        extra = [key for key in values if key not in self.DEFAULT_CONFIG]
+        if extra:
+            blocks.append('\n'.join(f"{key}={self._format_value(values[key])}" for key in extra))
+            
+        return '\n\n'.join(blocks) + '\n'
                 
     def get(self, key: str, default: str = '') -> str:
         """
@@ -55,6 +95,8 @@ class ConfigManager:
         Returns:
             Configuration value
         """
+        if key in self._cache:
+            return self._cache[key]
         return os.getenv(key, default)
         
     def get_int(self, key: str, default: int = 0) -> int:
@@ -82,8 +124,9 @@ class ConfigManager:
             value: Configuration value
         """
         set_key(self.env_file, key, value)
-        # Reload to update environment
-        load_dotenv(self.env_file, override=True)
+        # Write through instead of re-parsing the whole file
+        self._cache[key] = value
+        os.environ[key] = value
         
     def get_all(self) -> Dict[str, str]:
         """
@@ -97,6 +140,54 @@ class ConfigManager:
             config[key] = self.get(key, self.DEFAULT_CONFIG[key])
         return config
         
+    def write_batch(self, items: Dict[str, str]):
+        """
+        Set several configuration values with a single atomic file write.
+        
+        Args:
+            items: Dictionary of configuration key-value pairs
+        """
+        try:
+            with open(self.env_file) as f:
+                lines = f.readlines()
+            mode = stat.S_IMODE(os.stat(self.env_file).st_mode)
+        except FileNotFoundError:
+            lines = []
+            mode = 0o600
+            
+        # Rewrite assignments in place so comments, key order and keys we
+        # don't manage are kept; new keys are appended
+        output = []
+        written = set()
+        for line in lines:
+            match = self._KEY_LINE.match(line)
+            if match and match.group(1) in items:
+                key = match.group(1)
+                output.append(f"{key}={self._format_value(items[key])}\n")
+                written.add(key)
+            else:
+                output.append(line)
+        if output and not output[-1].endswith('\n'):
+            output[-1] += '\n'
+        output += [
+            f"{key}={self._format_value(value)}\n"
+            for key, value in items.items() if key not in written
+        ]
+        
+        # The file holds the HA token: never widen its permissions, and make
+        # the new contents durable before they replace the old file
+        tmp_file = self.env_file + '.tmp'
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.writelines(output)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_file, mode)
+        os.replace(tmp_file, self.env_file)
+        
+        self._cache.update((k, v) for k, v in items.items() if k in self.DEFAULT_CONFIG)
+        os.environ.update(items)
+        
     def update_all(self, config: Dict[str, str]):
         """
         Update multiple configuration values.
@@ -104,9 +195,10 @@ class ConfigManager:
         Args:
             config: Dictionary of configuration key-value pairs
         """
-        for key, value in config.items():
-            if key in self.DEFAULT_CONFIG:
-                self.set(key, value)
+        self.write_batch({
+            key: value for key, value in config.items()
+            if key in self.DEFAULT_CONFIG
+        })
                 
     def get_ha_config(self) -> Dict[str, str]:
         """Get Home Assistant configuration."""
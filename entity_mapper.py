@@ -2,11 +2,23 @@
 Entity Mapping and DMX Conversion Module
 Maps Home Assistant entities to DMX channels and handles value conversion
 """
+import asyncio
 import json
 import logging
-from typing import Dict, List, Any
-from dataclasses import dataclass, asdict
+import mmap
+import os
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass, asdict, field
 from enum import Enum
+from itertools import chain
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
@@ -22,18 +34,22 @@ class EntityType(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+# Direct value -> member lookup, avoids Enum.__call__ when loading mappings
+_TYPE_CACHE: Dict[str, EntityType] = {e.value: e for e in EntityType}
+
+
+@dataclass(slots=True)
 class EntityMapping:
     """Mapping configuration for a single entity."""
     entity_id: str
     entity_type: EntityType
     dmx_channel: int
     name: str = ""
-    rgb_channels: List[int] = None  # For RGB/RGBW: [R, G, B] or [R, G, B, W]
+    rgb_channels: Tuple[int, ...] = ()  # For RGB/RGBW: (R, G, B) or (R, G, B, W)
+    domain: str = field(default='', init=False)  # Derived from entity_id, not persisted
     
     def __post_init__(self):
-        if self.rgb_channels is None:
-            self.rgb_channels = []
+        self.domain = self.entity_id.partition('.')[0]
             
     def to_dict(self) -> Dict:
         """Convert to dictionary for JSON serialization."""
@@ -48,7 +64,9 @@ class EntityMapping:
     @classmethod
     def from_dict(cls, data: Dict) -> 'EntityMapping':
         """Create from dictionary."""
-        data['entity_type'] = EntityType(data['entity_type'])
+        data['entity_type'] = _TYPE_CACHE[data['entity_type']]
+        if 'rgb_channels' in data:
+            data['rgb_channels'] = tuple(data['rgb_channels'] or ())
         return cls(**data)
 
 
@@ -56,6 +74,21 @@ class EntityMapper:
     """Manages entity-to-DMX channel mappings and conversions."""
     
     SWITCH_THRESHOLD = 125  # DMX value above which switch turns on
+    SAVE_DELAY = 0.5  # Seconds to coalesce mapping changes into one file write
+    
+    # DMX value -> switch state (1 = ON), indexed by a whole frame at once
+    _SWITCH_LUT = (np.arange(256) > SWITCH_THRESHOLD).astype(np.uint8)
+    # DMX value -> color temperature in kelvin (2000-6500K)
+    _KELVIN_LUT: Tuple[int, ...] = tuple(2000 + (v * 4500) // 255 for v in range(256))
+    
+    # Color light types: (service data key, number of color channels)
+    _COLOR_LAYOUTS = {
+        EntityType.RGB: ('rgb_color', 3),
+        EntityType.RGBW: ('rgbw_color', 4),
+        EntityType.RGBWW: ('rgbww_color', 5),
+    }
+    # Color channels following the master channel, per light type
+    _RGB_OFFSETS = {entity_type: count for entity_type, (_, count) in _COLOR_LAYOUTS.items()}
     
     def __init__(self, config_file: str = 'entity_mappings.json'):
         """
@@ -65,16 +98,69 @@ class EntityMapper:
             config_file: Path to JSON file storing mappings
         """
         self.config_file = config_file
-        self.mappings: Dict[str, EntityMapping] = {}
-        self.channel_to_entity: Dict[int, str] = {}
+        # Loaded lazily on first access to mappings/channel_to_entity
+        self._loaded = False
+        self._mappings: Dict[str, EntityMapping] = {}
+        self._channel_to_entity: Dict[int, str] = {}
+        self._dirty = False
+        self._save_task: Optional[asyncio.Task] = None
+        self._write_lock = threading.Lock()  # Orders background and synchronous writes
+        self._save_seq = 0  # Sequence number of the last serialized snapshot
+        self._written_seq = 0  # Sequence number of the last snapshot on disk
+        # Precompiled per-frame routing (see _rebuild_channel_index)
+        self._indexed_mappings: List[EntityMapping] = []
+        # Parallel (channel, entity index) pairs; a channel may feed several entities
+        self._route_channels = np.zeros(0, dtype=np.intp)  # 0-based channel per pair
+        self._route_entities = np.zeros(0, dtype=np.intp)  # Index into _indexed_mappings per pair
+        self._last_frame: Optional[bytes] = None  # Last frame seen by get_entity_commands
+        self._full_refresh = True  # Process every entity on the next frame
+        self._routing_stale = False  # Routing needs recompiling after single-mapping edits
+        self._scalar = np.ones(0, dtype=bool)  # Entities handled per mapping
+        self._color_groups = []  # (color key, entity indices, master channels, color channels)
+        self._switch_idx = np.zeros(0, dtype=np.intp)  # Switch entity indices
+        self._switch_channels = np.zeros(0, dtype=np.intp)  # Their channels (0-based)
+        # Command builders per entity type (see get_entity_commands)
+        self._handlers = {
+            EntityType.SWITCH: self._cmd_switch,
+            EntityType.DIMMER: self._cmd_dimmer,
+            EntityType.COLOR_TEMP: self._cmd_color_temp,
+            EntityType.RGB: self._cmd_color,
+            EntityType.RGBW: self._cmd_color,
+            EntityType.RGBWW: self._cmd_color,
+        }
+        
+    @property
+    def mappings(self) -> Dict[str, EntityMapping]:
+        """Entity mappings by entity ID, loaded from disk on first access."""
+        if not self._loaded:
+            self._load_now()
+        return self._mappings
+        
+    @property
+    def channel_to_entity(self) -> Dict[int, str]:
+        """Channel-to-entity index, loaded from disk on first access."""
+        if not self._loaded:
+            self._load_now()
+        return self._channel_to_entity
+        
+    def _load_now(self):
+        """Parse the mappings file the first time mappings are needed."""
+        self._loaded = True
         self.load_mappings()
         
     def load_mappings(self):
         """Load mappings from JSON file."""
+        self._loaded = True
         try:
-            with open(self.config_file, 'r') as f:
-                data = json.load(f)
-                self.mappings = {
+            # Parse straight from the page cache instead of reading a copy
+            with open(self.config_file, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if orjson:
+                    with memoryview(mm) as view:
+                        data = orjson.loads(view)
+                else:
+                    data = json.loads(mm[:])
+                self._mappings = {
                     entity_id: EntityMapping.from_dict(mapping)
                     for entity_id, mapping in data.items()
                 }
@@ -87,26 +173,211 @@ class EntityMapper:
             
     def save_mappings(self):
         """Save mappings to JSON file."""
+        self._write_snapshot(*self._snapshot())
+        
+    def _snapshot(self) -> Tuple[int, bytes, int]:
+        """
+        Serialize the current mappings for writing.
+        
+        Returns:
+            (sequence number, JSON content, mapping count)
+        """
+        data = {
+            entity_id: mapping.to_dict()
+            for entity_id, mapping in self.mappings.items()
+        }
+        if orjson:
+            content = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        else:
+            content = json.dumps(data, indent=2).encode()
+        self._save_seq += 1
+        return self._save_seq, content, len(data)
+        
+    def _write_snapshot(self, seq: int, content: bytes, count: int):
+        """
+        Durably write a serialized snapshot; safe to call from a worker thread.
+        
+        Snapshots older than the last one written are skipped, so a slow
+        background write never overwrites a newer synchronous flush.
+        """
+        with self._write_lock:
+            if seq <= self._written_seq:
+                return
+            try:
+                # Write a durable copy first so a crash never leaves a truncated file
+                tmp_file = self.config_file + '.tmp'
+                with open(tmp_file, 'wb') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.config_file)
+                self._written_seq = seq
+                logger.info(f"Saved {count} entity mappings")
+            except Exception as e:
+                logger.error(f"Error saving mappings: {e}")
+                
+
+    def _schedule_save(self):
+        """
+        Mark mappings as changed and write them once after SAVE_DELAY.
+        
+        Consecutive changes within the delay share a single write. Without a
+        running event loop the mappings are saved immediately.
+        """
+        self._dirty = True
         try:
-            data = {
-                entity_id: mapping.to_dict()
-                for entity_id, mapping in self.mappings.items()
-            }
-            with open(self.config_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            logger.info(f"Saved {len(self.mappings)} entity mappings")
-        except Exception as e:
-            logger.error(f"Error saving mappings: {e}")
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+            
+        if self._save_task is None or self._save_task.done():
+            self._save_task = loop.create_task(self._debounced_save(self.SAVE_DELAY))
+            
+    async def _debounced_save(self, delay: float):
+        """Wait for further changes, then write pending mappings."""
+        await asyncio.sleep(delay)
+        self._save_task = None
+        if self._dirty:
+            self._dirty = False
+            # Serialize on the loop, but keep the write and fsync off it
+            await asyncio.to_thread(self._write_snapshot, *self._snapshot())
+        
+    def flush(self):
+        """Write pending mapping changes to disk now."""
+        if self._save_task is not None:
+            self._save_task.cancel()
+            self._save_task = None
+        if self._dirty:
+            self._dirty = False
+            self.save_mappings()
             
     def _rebuild_channel_index(self):
-        """Rebuild the channel-to-entity index."""
-        self.channel_to_entity = {}
-        for entity_id, mapping in self.mappings.items():
-            self.channel_to_entity[mapping.dmx_channel] = entity_id
-            # Also index RGB channels
-            for channel in mapping.rgb_channels:
-                self.channel_to_entity[channel] = entity_id
+        """Rebuild the channel-to-entity index and the per-frame routing table."""
+        self._channel_to_entity = {
+            channel: entity_id
+            for entity_id, mapping in self.mappings.items()
+            for channel in chain((mapping.dmx_channel,), mapping.rgb_channels)
+        }
+        self._compile_routing()
+        
+    def _add_to_index(self, mapping: EntityMapping):
+        """Index a single mapping's channels; routing is recompiled lazily."""
+        entity_id = mapping.entity_id
+        self._channel_to_entity[mapping.dmx_channel] = entity_id
+        # Also index RGB channels
+        for channel in mapping.rgb_channels:
+            self._channel_to_entity[channel] = entity_id
+        self._routing_stale = True
+        
+    def _remove_from_index(self, mapping: EntityMapping):
+        """Drop a single mapping's channels from the index."""
+        for channel in chain((mapping.dmx_channel,), mapping.rgb_channels):
+            if self._channel_to_entity.get(channel) == mapping.entity_id:
+                del self._channel_to_entity[channel]
+        self._routing_stale = True
+        
+    def _compile_routing(self):
+        """Compile the numpy per-frame routing tables from the current mappings."""
+        self._indexed_mappings = list(self.mappings.values())
+        route_channels = []
+        route_entities = []
+        
+        for index, mapping in enumerate(self._indexed_mappings):
+            for channel in chain((mapping.dmx_channel,), mapping.rgb_channels):
+                if 1 <= channel <= 512:
+                    route_channels.append(channel - 1)
+                    route_entities.append(index)
+                    
+        self._route_channels = np.array(route_channels, dtype=np.intp)
+        self._route_entities = np.array(route_entities, dtype=np.intp)
+        
+        self._compile_color_groups()
+        self._compile_switch_group()
+        self._routing_stale = False
+        
+        # Mappings changed: resend every entity on the next frame
+        self._full_refresh = True
+        
+    def _compile_color_groups(self):
+        """
+        Build SoA channel arrays for color lights so a frame is read with fancy indexing.
+        
+        Only mappings with the standard layout (enough color channels, all
+        inside the universe) are vectorized; anything else stays on the
+        per-mapping handler path.
+        """
+        self._scalar = np.ones(len(self._indexed_mappings), dtype=bool)
+        groups = {entity_type: ([], [], []) for entity_type in self._COLOR_LAYOUTS}
+        
+        for index, mapping in enumerate(self._indexed_mappings):
+            layout = self._COLOR_LAYOUTS.get(mapping.entity_type)
+            if layout is None:
+                continue
+            channels = [mapping.dmx_channel, *mapping.rgb_channels[:layout[1]]]
+            if len(channels) != layout[1] + 1 or not all(1 <= ch <= 512 for ch in channels):
+                continue
+            entity_idx, masters, colors = groups[mapping.entity_type]
+            entity_idx.append(index)
+            masters.append(channels[0] - 1)
+            colors.append([ch - 1 for ch in channels[1:]])
+            self._scalar[index] = False
+            
+        self._color_groups = [
+            (
+                self._COLOR_LAYOUTS[entity_type][0],
+                np.array(entity_idx, dtype=np.intp),
+                np.array(masters, dtype=np.intp),
+                np.array(colors, dtype=np.intp).reshape(-1, self._COLOR_LAYOUTS[entity_type][1])
+            )
+            for entity_type, (entity_idx, masters, colors) in groups.items()
+            if entity_idx
+        ]
+        
+    def _compile_switch_group(self):
+        """Build channel arrays for switches so a frame is evaluated with one LUT gather."""
+        switch_idx = []
+        switch_channels = []
+        for index, mapping in enumerate(self._indexed_mappings):
+            if mapping.entity_type == EntityType.SWITCH and 1 <= mapping.dmx_channel <= 512:
+                switch_idx.append(index)
+                switch_channels.append(mapping.dmx_channel - 1)
+                self._scalar[index] = False
                 
+        self._switch_idx = np.array(switch_idx, dtype=np.intp)
+        self._switch_channels = np.array(switch_channels, dtype=np.intp)
+        
+    def reset_frame_state(self):
+        """Forget the last frame so the next one updates every entity."""
+        self._last_frame = None
+        self._full_refresh = True
+        
+    def _changed_indices(self, dmx_data: np.ndarray) -> np.ndarray:
+        """
+        Get the entities touched by channels that changed since the last frame.
+        
+        Args:
+            dmx_data: Full universe as a uint8 array (channel N at index N-1)
+            
+        Returns:
+            Indices into _indexed_mappings of entities to re-evaluate
+        """
+        frame = dmx_data.tobytes()
+        if self._full_refresh or self._last_frame is None:
+            self._full_refresh = False
+            self._last_frame = frame
+            return np.arange(len(self._indexed_mappings))
+            
+        # Most consecutive frames are identical: a bytes compare skips numpy entirely
+        if frame == self._last_frame:
+            return np.zeros(0, dtype=np.intp)
+            
+        changed = dmx_data != np.frombuffer(self._last_frame, dtype=np.uint8)
+        self._last_frame = frame
+        
+        # Every entity with at least one changed channel, including shared channels
+        return np.unique(self._route_entities[changed[self._route_channels]])
+        
     def detect_entity_type(self, entity_state: Dict[str, Any]) -> EntityType:
         """
         Detect entity type from its state.
@@ -121,7 +392,7 @@ class EntityMapper:
         attributes = entity_state.get('attributes', {})
         
         # Check domain
-        domain = entity_id.split('.')[0]
+        domain = entity_id.partition('.')[0]
         
         if domain == 'switch':
             return EntityType.SWITCH
@@ -163,45 +434,22 @@ class EntityMapper:
             entity_type = self.detect_entity_type(entity_state)
             name = entity_state.get('attributes', {}).get('friendly_name', entity_id)
             
-            if entity_type == EntityType.RGB:
-                # RGB needs 3 consecutive channels
-                rgb_channels = [current_channel + 1, current_channel + 2, current_channel + 3]
-                mapping = EntityMapping(
-                    entity_id=entity_id,
-                    entity_type=entity_type,
-                    dmx_channel=current_channel,  # Master dimmer/switch
-                    name=name,
-                    rgb_channels=rgb_channels
-                )
-                current_channel += 4  # Master + R + G + B
-                
-            elif entity_type == EntityType.RGBW:
-                # RGBW needs 4 consecutive channels
-                rgb_channels = [current_channel + 1, current_channel + 2, current_channel + 3, current_channel + 4]
-                mapping = EntityMapping(
-                    entity_id=entity_id,
-                    entity_type=entity_type,
-                    dmx_channel=current_channel,  # Master dimmer/switch
-                    name=name,
-                    rgb_channels=rgb_channels
-                )
-                current_channel += 5  # Master + R + G + B + W
-                
-            else:
-                # Switch or dimmer needs 1 channel
-                mapping = EntityMapping(
-                    entity_id=entity_id,
-                    entity_type=entity_type,
-                    dmx_channel=current_channel,
-                    name=name
-                )
-                current_channel += 1
-                
+            # Master dimmer/switch followed by any color channels
+            rgb_channels = self._rgb_channels_for(current_channel, entity_type)
+            mapping = EntityMapping(
+                entity_id=entity_id,
+                entity_type=entity_type,
+                dmx_channel=current_channel,
+                name=name,
+                rgb_channels=rgb_channels
+            )
+            current_channel += 1 + len(rgb_channels)
+            
             self.mappings[entity_id] = mapping
             logger.info(f"Auto-assigned {entity_id} ({entity_type.value}) to channel {mapping.dmx_channel}")
             
         self._rebuild_channel_index()
-        self.save_mappings()
+        self._schedule_save()
         
     def update_mapping(self, entity_id: str, dmx_channel: int, entity_type: EntityType = None):
         """
@@ -214,45 +462,43 @@ class EntityMapper:
         """
         if entity_id in self.mappings:
             mapping = self.mappings[entity_id]
-            old_channel = mapping.dmx_channel
+            self._remove_from_index(mapping)
             mapping.dmx_channel = dmx_channel
-            
-            # Update RGB channels if entity is RGB/RGBW/RGBWW
-            if mapping.entity_type == EntityType.RGB:
-                mapping.rgb_channels = [dmx_channel + 1, dmx_channel + 2, dmx_channel + 3]
-            elif mapping.entity_type == EntityType.RGBW:
-                mapping.rgb_channels = [dmx_channel + 1, dmx_channel + 2, dmx_channel + 3, dmx_channel + 4]
-            elif mapping.entity_type == EntityType.RGBWW:
-                mapping.rgb_channels = [dmx_channel + 1, dmx_channel + 2, dmx_channel + 3, dmx_channel + 4, dmx_channel + 5]
-            
             if entity_type:
                 mapping.entity_type = entity_type
-                # Update RGB channels based on new type
-                if entity_type == EntityType.RGB:
-                    mapping.rgb_channels = [dmx_channel + 1, dmx_channel + 2, dmx_channel + 3]
-                elif entity_type == EntityType.RGBW:
-                    mapping.rgb_channels = [dmx_channel + 1, dmx_channel + 2, dmx_channel + 3, dmx_channel + 4]
-                elif entity_type == EntityType.RGBWW:
-                    mapping.rgb_channels = [dmx_channel + 1, dmx_channel + 2, dmx_channel + 3, dmx_channel + 4, dmx_channel + 5]
-                else:
-                    mapping.rgb_channels = []
+            # Color channels follow the master channel
+            mapping.rgb_channels = self._rgb_channels_for(dmx_channel, mapping.entity_type)
         else:
             mapping = EntityMapping(
                 entity_id=entity_id,
                 entity_type=entity_type or EntityType.UNKNOWN,
                 dmx_channel=dmx_channel
             )
+            mapping.rgb_channels = self._rgb_channels_for(dmx_channel, mapping.entity_type)
             self.mappings[entity_id] = mapping
             
-        self._rebuild_channel_index()
-        self.save_mappings()
+        self._add_to_index(mapping)
+        self._schedule_save()
+        
+    def _rgb_channels_for(self, dmx_channel: int, entity_type: EntityType) -> Tuple[int, ...]:
+        """
+        Get the color channels that follow a master channel.
+        
+        Args:
+            dmx_channel: Master DMX channel
+            entity_type: Entity type
+            
+        Returns:
+            Consecutive channel numbers (empty for non-color types)
+        """
+        count = self._RGB_OFFSETS.get(entity_type, 0)
+        return tuple(range(dmx_channel + 1, dmx_channel + 1 + count))
         
     def remove_mapping(self, entity_id: str):
         """Remove a mapping."""
         if entity_id in self.mappings:
-            del self.mappings[entity_id]
-            self._rebuild_channel_index()
-            self.save_mappings()
+            self._remove_from_index(self.mappings.pop(entity_id))
+            self._schedule_save()
             
     def get_all_mappings(self) -> List[EntityMapping]:
         """Get all current mappings."""
@@ -268,7 +514,20 @@ class EntityMapper:
         Returns:
             True for ON, False for OFF
         """
-        return dmx_value > self.SWITCH_THRESHOLD
+        return bool(self._SWITCH_LUT[dmx_value])
+        
+    def bulk_switch_states(self, frame: np.ndarray, channels: np.ndarray) -> np.ndarray:
+        """
+        Convert many DMX channels to switch states at once.
+        
+        Args:
+            frame: Full universe as a uint8 array (channel N at index N-1)
+            channels: 0-based channel indices into frame
+            
+        Returns:
+            uint8 array with 1 for ON and 0 for OFF, one entry per channel
+        """
+        return self._SWITCH_LUT[frame[channels]]
         
     def dmx_to_ha_brightness(self, dmx_value: int) -> int:
         """
@@ -282,109 +541,198 @@ class EntityMapper:
         """
         return dmx_value
         
-    def get_entity_commands(self, dmx_data: Dict[int, int]) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _read_channels(dmx_data: np.ndarray, channels: Tuple[int, ...]) -> List[int]:
+        """
+        Read a list of channels from a DMX frame.
+        
+        Args:
+            dmx_data: Full universe as a uint8 array (channel N at index N-1)
+            channels: DMX channel numbers (1-512)
+            
+        Returns:
+            Channel values as Python ints (0 for out-of-range channels)
+        """
+        first = channels[0] if channels else 0
+        # Fast path: consecutive channels inside the universe are a single slice
+        if 1 <= first and first + len(channels) - 1 <= len(dmx_data) \
+                and channels == tuple(range(first, first + len(channels))):
+            return dmx_data[first - 1:first - 1 + len(channels)].tolist()
+        return [int(dmx_data[ch - 1]) if 1 <= ch <= len(dmx_data) else 0 for ch in channels]
+        
+    def get_entity_commands(self, dmx_data: np.ndarray) -> List[Dict[str, Any]]:
         """
         Convert DMX channel data to Home Assistant commands.
         
+        Only entities with a channel that changed since the previous call
+        produce a command; the first frame after a mapping change (or
+        reset_frame_state) produces commands for every entity.
+        
         Args:
-            dmx_data: Dictionary of {channel: value}
+            dmx_data: Full universe as a uint8 array (channel N at index N-1)
             
         Returns:
             List of command dictionaries
         """
+        if not self._loaded:
+            self._load_now()
+        if self._routing_stale:
+            self._compile_routing()
+            
+        # Only entities whose channels changed since the last frame
+        indices = self._changed_indices(dmx_data)
+        if not indices.size:
+            return []
+            
         commands = []
-        processed_entities = set()
         
-        for mapping in self.mappings.values():
-            if mapping.entity_id in processed_entities:
-                continue
+        # Color lights: one gather per group for all selected fixtures
+        selected = np.zeros(len(self._indexed_mappings), dtype=bool)
+        selected[indices] = True
+        for color_key, entity_idx, masters, colors in self._color_groups:
+            sel = selected[entity_idx]
+            if sel.any():
+                commands.extend(self._color_group_commands(
+                    color_key, entity_idx[sel], dmx_data[masters[sel]], dmx_data[colors[sel]]
+                ))
                 
-            entity_id = mapping.entity_id
-            dmx_channel = mapping.dmx_channel
+        # Switches: one LUT gather for all selected switches
+        sel = selected[self._switch_idx]
+        if sel.any():
+            states = self.bulk_switch_states(dmx_data, self._switch_channels[sel])
+            mappings = self._indexed_mappings
+            commands.extend(
+                {
+                    'entity_id': mappings[i].entity_id,
+                    'domain': mappings[i].domain,
+                    'action': 'turn_on' if on else 'turn_off'
+                }
+                for i, on in zip(self._switch_idx[sel].tolist(), states.tolist())
+            )
             
-            if dmx_channel not in dmx_data:
+        # Everything else: per-mapping handlers
+        for index in indices[self._scalar[indices]].tolist():
+            mapping = self._indexed_mappings[index]
+            dmx_channel = mapping.dmx_channel
+            if not 1 <= dmx_channel <= len(dmx_data):
                 continue
                 
-            dmx_value = dmx_data[dmx_channel]
-            
-            if mapping.entity_type == EntityType.SWITCH:
-                # Switch: ON if > threshold, OFF otherwise
-                should_be_on = self.dmx_to_ha_switch(dmx_value)
-                commands.append({
-                    'entity_id': entity_id,
-                    'action': 'turn_on' if should_be_on else 'turn_off'
-                })
+            handler = self._handlers.get(mapping.entity_type)
+            if handler is None:
+                continue
                 
-            elif mapping.entity_type == EntityType.DIMMER:
-                # Dimmer: Map DMX value to brightness
-                brightness = self.dmx_to_ha_brightness(dmx_value)
-                if brightness > 0:
-                    commands.append({
-                        'entity_id': entity_id,
-                        'action': 'turn_on',
-                        'brightness': brightness
-                    })
-                else:
-                    commands.append({
-                        'entity_id': entity_id,
-                        'action': 'turn_off'
-                    })
-                    
-            elif mapping.entity_type == EntityType.COLOR_TEMP:
-                # Color Temperature: Map DMX value to kelvin (2000-6500K)
-                brightness = self.dmx_to_ha_brightness(dmx_value)
-                if brightness > 0:
-                    # Map 0-255 to 2000-6500K
-                    kelvin = int(2000 + (dmx_value / 255.0) * 4500)
-                    commands.append({
-                        'entity_id': entity_id,
-                        'action': 'turn_on',
-                        'brightness': brightness,
-                        'kelvin': kelvin
-                    })
-                else:
-                    commands.append({
-                        'entity_id': entity_id,
-                        'action': 'turn_off'
-                    })
-                    
-            elif mapping.entity_type in [EntityType.RGB, EntityType.RGBW, EntityType.RGBWW]:
-                # RGB/RGBW/RGBWW: Get color values from assigned channels
-                brightness = self.dmx_to_ha_brightness(dmx_value)
+            command = handler(mapping, int(dmx_data[dmx_channel - 1]), dmx_data)
+            if command:
+                commands.append(command)
                 
-                if len(mapping.rgb_channels) >= 3:
-                    r = dmx_data.get(mapping.rgb_channels[0], 0)
-                    g = dmx_data.get(mapping.rgb_channels[1], 0)
-                    b = dmx_data.get(mapping.rgb_channels[2], 0)
-                    
-                    if brightness > 0:
-                        command = {
-                            'entity_id': entity_id,
-                            'action': 'turn_on',
-                            'brightness': brightness
-                        }
-                        
-                        # Add color based on type
-                        if mapping.entity_type == EntityType.RGBW and len(mapping.rgb_channels) >= 4:
-                            # RGBW: Use rgbw_color parameter
-                            w = dmx_data.get(mapping.rgb_channels[3], 0)
-                            command['rgbw_color'] = [r, g, b, w]
-                        elif mapping.entity_type == EntityType.RGBWW and len(mapping.rgb_channels) >= 5:
-                            # RGBWW: Use rgbww_color parameter (R, G, B, CW, WW)
-                            cw = dmx_data.get(mapping.rgb_channels[3], 0)
-                            ww = dmx_data.get(mapping.rgb_channels[4], 0)
-                            command['rgbww_color'] = [r, g, b, cw, ww]
-                        else:
-                            # RGB: Use rgb_color parameter
-                            command['rgb_color'] = [r, g, b]
-                            
-                        commands.append(command)
-                    else:
-                        commands.append({
-                            'entity_id': entity_id,
-                            'action': 'turn_off'
-                        })
-                        
-            processed_entities.add(entity_id)
+        return commands
+        
+    def _color_group_commands(self, color_key: str, entity_idx: np.ndarray,
+                              brightness: np.ndarray, colors: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Build commands for a group of color lights read from one frame.
+        
+        Args:
+            color_key: Service data key ('rgb_color', 'rgbw_color', 'rgbww_color')
+            entity_idx: Indices into _indexed_mappings
+            brightness: Master channel value per entity
+            colors: Color channel values per entity (one row per entity)
             
+        Returns:
+            List of command dictionaries
+        """
+        on_mask = brightness > 0
+        mappings = self._indexed_mappings
+        
+        commands = [
+            {'entity_id': mappings[i].entity_id, 'domain': mappings[i].domain, 'action': 'turn_off'}
+            for i in entity_idx[~on_mask].tolist()
+        ]
+        for i, level, color in zip(entity_idx[on_mask].tolist(),
+                                   brightness[on_mask].tolist(),
+                                   colors[on_mask].tolist()):
+            commands.append({
+                'entity_id': mappings[i].entity_id,
+                'domain': mappings[i].domain,
+                'action': 'turn_on',
+                'brightness': level,
+                color_key: color
+            })
         return commands
+        
+    def _cmd_switch(self, mapping: EntityMapping, dmx_value: int, dmx_data: np.ndarray) -> Dict[str, Any]:
+        """Switch: ON if > threshold, OFF otherwise."""
+        should_be_on = self.dmx_to_ha_switch(dmx_value)
+        return {
+            'entity_id': mapping.entity_id,
+            'domain': mapping.domain,
+            'action': 'turn_on' if should_be_on else 'turn_off'
+        }
+        
+    def _cmd_dimmer(self, mapping: EntityMapping, dmx_value: int, dmx_data: np.ndarray) -> Dict[str, Any]:
+        """Dimmer: Map DMX value to brightness."""
+        brightness = self.dmx_to_ha_brightness(dmx_value)
+        if brightness > 0:
+            return {
+                'entity_id': mapping.entity_id,
+                'domain': mapping.domain,
+                'action': 'turn_on',
+                'brightness': brightness
+            }
+        return {
+            'entity_id': mapping.entity_id,
+            'domain': mapping.domain,
+            'action': 'turn_off'
+        }
+        
+    def _cmd_color_temp(self, mapping: EntityMapping, dmx_value: int, dmx_data: np.ndarray) -> Dict[str, Any]:
+        """Color Temperature: Map DMX value to kelvin (2000-6500K)."""
+        brightness = self.dmx_to_ha_brightness(dmx_value)
+        if brightness > 0:
+            kelvin = self._KELVIN_LUT[dmx_value]
+            return {
+                'entity_id': mapping.entity_id,
+                'domain': mapping.domain,
+                'action': 'turn_on',
+                'brightness': brightness,
+                'kelvin': kelvin
+            }
+        return {
+            'entity_id': mapping.entity_id,
+            'domain': mapping.domain,
+            'action': 'turn_off'
+        }
+        
+    def _cmd_color(self, mapping: EntityMapping, dmx_value: int, dmx_data: np.ndarray) -> Optional[Dict[str, Any]]:
+        """RGB/RGBW/RGBWW: Get color values from assigned channels."""
+        if len(mapping.rgb_channels) < 3:
+            return None
+            
+        brightness = self.dmx_to_ha_brightness(dmx_value)
+        if brightness <= 0:
+            return {
+                'entity_id': mapping.entity_id,
+                'domain': mapping.domain,
+                'action': 'turn_off'
+            }
+            
+        colors = self._read_channels(dmx_data, mapping.rgb_channels)
+        command = {
+            'entity_id': mapping.entity_id,
+            'domain': mapping.domain,
+            'action': 'turn_on',
+            'brightness': brightness
+        }
+        
+        # Add color based on type
+        if mapping.entity_type == EntityType.RGBW and len(colors) >= 4:
+            # RGBW: Use rgbw_color parameter
+            command['rgbw_color'] = colors[:4]
+        elif mapping.entity_type == EntityType.RGBWW and len(colors) >= 5:
+            # RGBWW: Use rgbww_color parameter (R, G, B, CW, WW)
+            command['rgbww_color'] = colors[:5]
+        else:
+            # RGB: Use rgb_color parameter
+            command['rgb_color'] = colors[:3]
+            
+        return command
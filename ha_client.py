@@ -14,6 +14,9 @@ logger = logging.getLogger(__name__)
 class HomeAssistantClient:
     """Client for communicating with Home Assistant via WebSocket API."""
     
+    REGISTRY_QUERY_CONCURRENCY = 16  # Max in-flight per-entity registry queries
+    EVENT_QUEUE_SIZE = 1000  # Unsolicited messages kept before dropping the oldest
+    
     def __init__(self, url: str, token: str):
         """
         Initialize Home Assistant client.
@@ -30,12 +33,21 @@ class HomeAssistantClient:
         self.message_id = 1
         self.connected = False
         self.entities: Dict[str, Dict] = {}
-        self._lock = asyncio.Lock()  # Lock for WebSocket operations
+        self._send_lock = asyncio.Lock()  # Serializes frame writes only
+        self._pending: Dict[int, asyncio.Future] = {}  # Responses awaited by message ID
+        self._reader: Optional[asyncio.Task] = None
+        self.events: Optional[asyncio.Queue] = None  # Messages without a pending request
         
     async def connect(self):
         """Connect to Home Assistant WebSocket API."""
+        # Tear down a previous connection so only one reader owns the socket
+        if self.websocket or self._reader:
+            await self.disconnect()
+            
         try:
-            self.session = aiohttp.ClientSession()
+            # Reuse the session across reconnects
+            if self.session is None or self.session.closed:
+                self.session = aiohttp.ClientSession()
             self.websocket = await self.session.ws_connect(self.ws_url)
             
             # Receive auth required message
@@ -55,6 +67,10 @@ class HomeAssistantClient:
                 raise Exception(f"Authentication failed: {msg}")
                 
             self.connected = True
+            
+            # Single reader routes responses to their requests by ID
+            self.events = asyncio.Queue(maxsize=self.EVENT_QUEUE_SIZE)
+            self._reader = asyncio.create_task(self._read_loop())
             logger.info("Connected to Home Assistant")
             
         except Exception as e:
@@ -63,18 +79,71 @@ class HomeAssistantClient:
             raise
             
     async def disconnect(self):
-        """Disconnect from Home Assistant."""
+        """Disconnect from Home Assistant, keeping the HTTP session for reuse."""
         self.connected = False
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
         if self.websocket:
             await self.websocket.close()
+            self.websocket = None
+        logger.info("Disconnected from Home Assistant")
+        
+    async def close(self):
+        """Disconnect and release the HTTP session."""
+        await self.disconnect()
         if self.session:
             await self.session.close()
-        logger.info("Disconnected from Home Assistant")
+            self.session = None
         
+    async def _read_loop(self):
+        """Receive messages and resolve the pending request with the same ID."""
+        try:
+            while True:
+                msg = await self.websocket.receive()
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    if msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+                                    aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+                    continue
+                    
+                data = json.loads(msg.data)
+                future = self._pending.pop(data.get('id'), None)
+                if future is not None:
+                    if not future.done():
+                        future.set_result(data)
+                    continue
+                    
+                # Not a response we wait for (e.g. an event): queue it
+                if self.events.full():
+                    self.events.get_nowait()
+                self.events.put_nowait(data)
+                
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error reading from Home Assistant: {e}")
+        finally:
+            if self.connected:
+                logger.warning("Home Assistant connection lost")
+            self.connected = False
+            # Nothing will answer outstanding requests now
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Home Assistant connection closed"))
+            self._pending.clear()
+            
     async def send_command(self, command: Dict[str, Any]) -> Dict[str, Any]:
         """
         Send a command to Home Assistant and wait for response.
         
+        Any number of commands may be in flight; responses are matched to
+        requests by message ID.
+        
         Args:
             command: Command dictionary
             
@@ -84,17 +153,18 @@ class HomeAssistantClient:
         if not self.connected:
             raise Exception("Not connected to Home Assistant")
         
-        async with self._lock:
-            command['id'] = self.message_id
-            self.message_id += 1
-            
-            await self.websocket.send_json(command)
-            
-            # Wait for response with matching ID
-            while True:
-                msg = await self.websocket.receive_json()
-                if msg.get('id') == command['id']:
-                    return msg
+        message_id = self.message_id
+        self.message_id += 1
+        command['id'] = message_id
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            async with self._send_lock:
+                await self.websocket.send_json(command)
+            return await future
+        finally:
+            self._pending.pop(message_id, None)
                 
     async def get_states(self) -> List[Dict[str, Any]]:
         """Get all entity states from Home Assistant."""
@@ -116,34 +186,109 @@ class HomeAssistantClient:
         Returns:
             List of entity states
         """
-        # Get all states
-        all_states = await self.get_states()
+        # The registry listing doesn't depend on the states, so fetch both at once
+        all_states, labels_by_id = await asyncio.gather(
+            self.get_states(),
+            self._list_registry_labels()
+        )
+        # Entities missing from a successful bulk listing have no labels;
+        # per-entity lookups that failed outright fall back to attributes
+        bulk_listed = labels_by_id is not None
+        if not bulk_listed:
+            labels_by_id = await self._query_registry_labels(
+                [state.get('entity_id', '') for state in all_states]
+            )
         
         # Filter entities with the specified label
         labeled_entities = []
         for state in all_states:
-            entity_id = state.get('entity_id', '')
-            # Get entity registry entry
-            try:
-                registry_response = await self.send_command({
-                    'type': 'config/entity_registry/get',
-                    'entity_id': entity_id
-                })
-                
-                if registry_response.get('success'):
-                    labels = registry_response.get('result', {}).get('labels', [])
-                    if label in labels:
-                        labeled_entities.append(state)
-            except:
-                # If entity not in registry, check attributes
-                labels = state.get('attributes', {}).get('labels', [])
-                if label in labels or label in str(state.get('attributes', {})):
+            labels = labels_by_id.get(state.get('entity_id', ''))
+            if labels is None and bulk_listed:
+                labels = []
+            if labels is not None:
+                if label in labels:
                     labeled_entities.append(state)
+            elif self._state_has_label(state, label):
+                # If the registry lookup failed, check attributes
+                labeled_entities.append(state)
                     
         self.entities = {e['entity_id']: e for e in labeled_entities}
         logger.info(f"Found {len(labeled_entities)} entities with label '{label}'")
         return labeled_entities
         
+    async def _list_registry_labels(self) -> Optional[Dict[str, List[str]]]:
+        """
+        Get labels for every registry entity in a single call.
+        
+        Prefers the compact config/entity_registry/list_for_display payload
+        and falls back to config/entity_registry/list.
+        
+        Returns:
+            Dictionary of {entity_id: labels}, or None if neither command is
+            supported by this Home Assistant version
+        """
+        display_response = await self.send_command({
+            'type': 'config/entity_registry/list_for_display'
+        })
+        if display_response.get('success'):
+            # Abbreviated keys: 'ei' = entity_id, 'lb' = labels (omitted when empty)
+            return {
+                entry['ei']: entry.get('lb') or []
+                for entry in display_response.get('result', {}).get('entities', [])
+            }
+            
+        registry_response = await self.send_command({
+            'type': 'config/entity_registry/list'
+        })
+        if registry_response.get('success'):
+            return {
+                entry['entity_id']: entry.get('labels') or []
+                for entry in registry_response.get('result', [])
+            }
+        return None
+        
+    async def _query_registry_labels(self, entity_ids: List[str]) -> Dict[str, List[str]]:
+        """
+        Get registry labels with concurrent per-entity config/entity_registry/get queries.
+        
+        Args:
+            entity_ids: Entity IDs to look up
+            
+        Returns:
+            Dictionary of {entity_id: labels}; entities whose lookup failed
+            are left out
+        """
+        semaphore = asyncio.Semaphore(self.REGISTRY_QUERY_CONCURRENCY)
+        
+        async def query(entity_id: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.send_command({
+                    'type': 'config/entity_registry/get',
+                    'entity_id': entity_id
+                })
+                
+        results = await asyncio.gather(
+            *(query(entity_id) for entity_id in entity_ids),
+            return_exceptions=True
+        )
+        
+        labels_by_id = {}
+        for entity_id, response in zip(entity_ids, results):
+            if isinstance(response, Exception):
+                continue
+            if response.get('success'):
+                labels_by_id[entity_id] = response.get('result', {}).get('labels') or []
+            else:
+                labels_by_id[entity_id] = []
+        return labels_by_id
+        
+    @staticmethod
+    def _state_has_label(state: Dict[str, Any], label: str) -> bool:
+        """Check a state's attributes for a label (entities outside the registry)."""
+        attributes = state.get('attributes', {})
+        labels = attributes.get('labels', [])
+        return label in labels or label in str(attributes)
+        
     async def call_service(self, domain: str, service: str, entity_id: str, **kwargs):
         """
         Call a Home Assistant service.
@@ -151,7 +296,7 @@ class HomeAssistantClient:
         Args:
             domain: Service domain (e.g., 'light', 'switch')
             service: Service name (e.g., 'turn_on', 'turn_off')
-            entity_id: Target entity ID
+            entity_id: Target entity ID (or list of IDs)
             **kwargs: Additional service data
         """
         service_data = {
@@ -169,14 +314,31 @@ class HomeAssistantClient:
         if not response.get('success'):
             logger.error(f"Service call failed: {response}")
             
-    async def turn_on(self, entity_id: str, **kwargs):
-        """Turn on an entity."""
-        domain = entity_id.split('.')[0]
+    async def call_service_bulk(self, domain: str, service: str, entity_ids: List[str], **kwargs):
+        """
+        Call a Home Assistant service for several entities in one message.
+        
+        Args:
+            domain: Service domain (e.g., 'light', 'switch')
+            service: Service name (e.g., 'turn_on', 'turn_off')
+            entity_ids: Target entity IDs (all receive the same service data)
+            **kwargs: Additional service data
+        """
+        await self.call_service(
+            domain,
+            service,
+            entity_ids[0] if len(entity_ids) == 1 else list(entity_ids),
+            **kwargs
+        )
+        
+    async def turn_on(self, entity_id: str, domain: Optional[str] = None, **kwargs):
+        """Turn on an entity (domain defaults to the entity_id prefix)."""
+        domain = domain or entity_id.partition('.')[0]
         await self.call_service(domain, 'turn_on', entity_id, **kwargs)
         
-    async def turn_off(self, entity_id: str):
-        """Turn off an entity."""
-        domain = entity_id.split('.')[0]
+    async def turn_off(self, entity_id: str, domain: Optional[str] = None):
+        """Turn off an entity (domain defaults to the entity_id prefix)."""
+        domain = domain or entity_id.partition('.')[0]
         await self.call_service(domain, 'turn_off', entity_id)
         
     async def set_brightness(self, entity_id: str, brightness: int):
@@ -15,13 +15,18 @@ function connectWebSocket() {
     const wsUrl = `${protocol}//${window.location.host}/ws`;
     
     ws = new WebSocket(wsUrl);
+    // Status frames are sent as binary (orjson bytes)
+    ws.binaryType = 'arraybuffer';
     
     ws.onopen = () => {
         console.log('WebSocket connected');
     };
     
     ws.onmessage = (event) => {
-        const data = JSON.parse(event.data);
+        const text = typeof event.data === 'string'
+            ? event.data
+            : new TextDecoder().decode(event.data);
+        const data = JSON.parse(text);
         if (data.type === 'status') {
             updateStatusUI(data.data);
         }
@@ -0,0 +1,61 @@
+"""
+Tests for DMX frame routing in EntityMapper
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entity_mapper import EntityMapper, EntityType  # noqa: E402
+
+
+class SharedChannelTest(unittest.TestCase):
+    """Entities that share a DMX channel must all react to it."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.mapper = EntityMapper(os.path.join(self.tmp_dir.name, 'mappings.json'))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _commands(self, frame: np.ndarray) -> dict:
+        return {
+            command['entity_id']: command
+            for command in self.mapper.get_entity_commands(frame)
+        }
+
+    def test_switches_on_same_channel(self):
+        self.mapper.update_mapping('switch.a', 1, EntityType.SWITCH)
+        self.mapper.update_mapping('switch.b', 1, EntityType.SWITCH)
+        frame = np.zeros(512, dtype=np.uint8)
+        self._commands(frame)
+
+        frame = frame.copy()
+        frame[0] = 255
+        commands = self._commands(frame)
+
+        self.assertEqual(commands['switch.a']['action'], 'turn_on')
+        self.assertEqual(commands['switch.b']['action'], 'turn_on')
+
+    def test_dimmer_on_color_channel(self):
+        self.mapper.update_mapping('light.rgb', 1, EntityType.RGB)
+        self.mapper.update_mapping('light.dimmer', 3, EntityType.DIMMER)
+        frame = np.zeros(512, dtype=np.uint8)
+        frame[0] = 255
+        self._commands(frame)
+
+        frame = frame.copy()
+        frame[2] = 100  # G channel of light.rgb, master of light.dimmer
+        commands = self._commands(frame)
+
+        self.assertEqual(commands['light.rgb']['rgb_color'], [0, 100, 0])
+        self.assertEqual(commands['light.dimmer']['brightness'], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()